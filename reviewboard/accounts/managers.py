@@ -0,0 +1,93 @@
+from django.db import connections, router, transaction
+from django.db.models import Manager
+
+
+class LocalSiteProfileManager(Manager):
+    """A manager for LocalSiteProfile models."""
+
+    def update_review_request_counts(self, review_request, delta,
+                                     group_ids, update_starred=True):
+        """Adjusts the review request counters affected by a review request.
+
+        This adds ``delta`` to the following counters on the review
+        request's LocalSite:
+
+          * The direct incoming count of every target person.
+
+          * The total incoming count of every target person and every
+            member of a target group.
+
+          * The starred public count of every user who starred the review
+            request.
+
+        ``group_ids`` is the list of the review request's target group IDs.
+        Passing these in lets the group members be looked up directly by
+        group, and skipped entirely when there are no target groups.
+
+        If ``update_starred`` is False, the starred public counts are left
+        alone. This is for callers that are only swapping out the review
+        request's reviewers, which doesn't change who has it starred.
+
+        All three counters are updated in a single UPDATE statement, rather
+        than one statement per counter.
+        """
+        if review_request.local_site_id:
+            local_site_query = \
+                'local_site_id = %d' % review_request.local_site_id
+        else:
+            local_site_query = 'local_site_id IS NULL'
+
+        people_query = (
+            'SELECT user_id'
+            '  FROM reviews_reviewrequest_target_people'
+            '  WHERE reviewrequest_id = %d' % review_request.pk)
+
+        if group_ids:
+            group_users_query = (
+                'SELECT user_id'
+                '  FROM reviews_group_users'
+                '  WHERE group_id IN (%s)'
+                % ', '.join([str(int(group_id)) for group_id in group_ids]))
+        else:
+            # There are no group members to match, so skip the group users
+            # table. "user_id IN (NULL)" never matches.
+            group_users_query = 'NULL'
+
+        if update_starred:
+            starred_query = (
+                'SELECT profile_id'
+                '  FROM accounts_profile_starred_review_requests'
+                '  WHERE reviewrequest_id = %d' % review_request.pk)
+        else:
+            starred_query = 'NULL'
+
+        db = router.db_for_write(self.model)
+        cursor = connections[db].cursor()
+        cursor.execute(
+            'UPDATE %(table)s SET'
+            '  direct_incoming_request_count ='
+            '    direct_incoming_request_count +'
+            '    CASE WHEN user_id IN (%(people)s)'
+            '         THEN %(delta)d ELSE 0 END,'
+            '  total_incoming_request_count ='
+            '    total_incoming_request_count +'
+            '    CASE WHEN user_id IN (%(people)s)'
+            '           OR user_id IN (%(group_users)s)'
+            '         THEN %(delta)d ELSE 0 END,'
+            '  starred_public_request_count ='
+            '    starred_public_request_count +'
+            '    CASE WHEN profile_id IN (%(starred)s)'
+            '         THEN %(delta)d ELSE 0 END'
+            '  WHERE %(local_site_query)s'
+            '    AND (user_id IN (%(people)s) OR'
+            '         user_id IN (%(group_users)s) OR'
+            '         profile_id IN (%(starred)s))' % {
+                'table': self.model._meta.db_table,
+                'delta': delta,
+                'local_site_query': local_site_query,
+                'people': people_query,
+                'group_users': group_users_query,
+                'starred': starred_query,
+            })
+
+        transaction.commit_unless_managed(using=db)
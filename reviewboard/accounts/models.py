@@ -7,6 +7,7 @@ from django.utils.translation import ugettext_lazy as _
 from djblets.util.db import ConcurrencyManager
 from djblets.util.fields import CounterField
 
+from reviewboard.accounts.managers import LocalSiteProfileManager
 from reviewboard.reviews.models import Group, ReviewRequest
 from reviewboard.site.models import LocalSite
 
@@ -196,6 +197,8 @@ class LocalSiteProfile(models.Model):
             (p.profile.starred_review_requests.public(
                 p.user, local_site=p.local_site).count() or 0))
 
+    objects = LocalSiteProfileManager()
+
     class Meta:
         unique_together = (('user', 'local_site'),
                            ('profile', 'local_site'))
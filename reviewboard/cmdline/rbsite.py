@@ -1646,6 +1646,7 @@ class UpgradeCommand(Command):
 
             print "Resetting in-database caches."
             site.run_manage_command("fixreviewcounts")
+            site.run_manage_command("fixreviewparticipants")
 
         print "Upgrade complete."
 
@@ -100,7 +100,7 @@ def review(request, username, format):
     return report(request, username, format,
                   reports['review'],
                   lambda user, since: {
-                      'reviews' : Review.objects.filter(
+                      'reviews' : Review.objects.with_request().filter(
                           user=user,
                           timestamp__gt=since)
                   })
@@ -113,7 +113,7 @@ def status_report(request, username, format):
                       'review_requests' : ReviewRequest.objects.filter(
                           submitter=user,
                           time_added__gt=since),
-                      'reviews' : Review.objects.filter(
+                      'reviews' : Review.objects.with_request().filter(
                           user=user,
                           timestamp__gt=since)
                   })
@@ -0,0 +1,10 @@
+from django_evolution.mutations import SQLMutation
+
+
+MUTATIONS = [
+    SQLMutation('review_base_reply_to_index', ["""
+        CREATE INDEX review__base_reply_to_public_user
+            ON reviews_review
+               (base_reply_to_id, public, user_id);
+"""])
+]
@@ -0,0 +1,29 @@
+from django.core.management.base import NoArgsCommand
+from django.db import connections, router, transaction
+
+from reviewboard.reviews.models import ReviewRequestParticipant
+
+
+class Command(NoArgsCommand):
+    help="Rebuilds the list of participants on every review request."
+
+    def handle_noargs(self, **options):
+        self.rebuild_participants()
+
+    @transaction.commit_on_success
+    def rebuild_participants(self):
+        table = ReviewRequestParticipant._meta.db_table
+
+        # Clear out and copy every distinct review author over with one
+        # statement each, rather than loading or inserting participants
+        # one at a time.
+        db = router.db_for_write(ReviewRequestParticipant)
+        cursor = connections[db].cursor()
+        cursor.execute('DELETE FROM %s' % table)
+        cursor.execute(
+            'INSERT INTO %(table)s (review_request_id, user_id)'
+            '  SELECT DISTINCT review_request_id, user_id'
+            '    FROM reviews_review' % {
+                'table': table,
+            })
+        transaction.set_dirty(using=db)
@@ -3,7 +3,7 @@ import logging
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import connections, router
-from django.db.models import Manager, Q
+from django.db.models import F, Manager, Q
 from django.db.models.query import QuerySet
 
 from djblets.util.db import ConcurrencyManager
@@ -45,6 +45,16 @@ class ReviewGroupManager(Manager):
 
         return qs.filter(local_site=local_site)
 
+    def update_review_request_counts(self, group_ids, delta):
+        """Adjusts the incoming counts of a review request's target groups.
+
+        This adds ``delta`` to the incoming request count of every group in
+        ``group_ids``, in a single UPDATE statement.
+        """
+        if group_ids:
+            self.filter(pk__in=group_ids).update(
+                incoming_request_count=F('incoming_request_count') + delta)
+
 
 class ReviewRequestQuerySet(QuerySet):
     def with_counts(self, user):
@@ -287,6 +297,52 @@ class ReviewManager(ConcurrencyManager):
     load. This prevents errors and lost data.
     """
 
+    def accessible(self, user):
+        """Returns reviews that are accessible by the given user.
+
+        This performs the same checks as Review.is_accessible_by, but
+        as a query, so that reviews can be filtered in the database rather
+        than one at a time.
+        """
+        from reviewboard.reviews.models import Group
+
+        # A review group that isn't ready for reviews hides every review
+        # from its members.
+        if Group.objects.accessible(user).filter(
+            ready_for_reviews=False).exists():
+            return self.none()
+
+        # Groups the user can access, as per Group.is_accessible_by.
+        groups = Group.objects.accessible(user, visible_only=False)
+
+        # Every review's author can access visible, open groups, so if the
+        # user can access one of those, they can see every review.
+        if groups.filter(invite_only=False, visible=True).exists():
+            return self.all()
+
+        q = Q(user__review_groups__in=groups.values('pk'))
+
+        if groups.exists():
+            # Superusers can access every group, including the ones the
+            # user can access.
+            q = q | Q(user__is_superuser=True)
+
+        if user.is_authenticated():
+            q = q | Q(review_request__submitter=user)
+
+        return self.filter(q).distinct()
+
+    def with_request(self):
+        """Returns reviews with their review requests loaded.
+
+        This pulls in the review request, along with what's needed to
+        display it and build the review's URL, in the same query as the
+        reviews.
+        """
+        return self.select_related('user', 'review_request',
+                                   'review_request__submitter',
+                                   'review_request__local_site')
+
     def get_pending_review(self, review_request, user):
         """Returns a user's pending review on a review request.
 
@@ -4,8 +4,10 @@ import logging
 from datetime import datetime
 
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import wraps
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
@@ -37,6 +39,61 @@ from reviewboard.site.urlresolvers import local_site_reverse
 # The model for the review request summary only allows it to be 300 chars long
 MAX_SUMMARY_LENGTH = 300
 
+# Compiled DefaultReviewer.file_regex patterns, keyed off the
+# DefaultReviewer's ID and pattern.
+_default_reviewer_regex_cache = {}
+
+# Alternations of all DefaultReviewer.file_regex patterns that apply to a
+# repository, keyed off the repository's ID. Each value is a tuple of the
+# (ID, pattern) pairs the regex was built from and the compiled regex.
+_default_reviewer_combined_regex_cache = {}
+
+# Patterns containing numbered group references or inline flags change
+# meaning when embedded in a larger expression, so they can't be combined.
+_UNCOMBINABLE_FILE_REGEX_RE = re.compile(r'\\[1-9]|\(\?[iLmsux(]')
+
+# Splits the bugs_closed field into individual bug IDs.
+_BUG_SPLIT_RE = re.compile(r'[,\s]+')
+
+
+def _commit_on_success_unless_managed(func):
+    """Runs the decorated function in its own transaction when needed.
+
+    Django's commit_on_success commits whatever transaction is open when
+    it exits, even if the caller is managing that transaction itself. If
+    a transaction is already being managed, the function just runs as part
+    of it, and the caller decides when to commit.
+    """
+    managed_func = transaction.commit_on_success(func)
+
+    def _call(*args, **kwargs):
+        if transaction.is_managed():
+            return func(*args, **kwargs)
+
+        return managed_func(*args, **kwargs)
+
+    return wraps(func)(_call)
+
+
+def _get_bug_list(bugs_closed):
+    """Returns a sorted list of the bugs in a bugs_closed field."""
+    if bugs_closed == "":
+        return []
+
+    # Leading or trailing separators would otherwise produce empty IDs,
+    # which would also break the numeric sort below.
+    bugs = [bug for bug in _BUG_SPLIT_RE.split(bugs_closed) if bug]
+
+    # First try a numeric sort, to show the best results for the majority
+    # case of bug trackers with numeric IDs.  If that fails, sort
+    # alphabetically.
+    try:
+        bugs.sort(key=int)
+    except ValueError:
+        bugs.sort()
+
+    return bugs
+
 
 def update_obj_with_changenum(obj, repository, changenum):
     """
@@ -64,14 +121,17 @@ def update_obj_with_changenum(obj, repository, changenum):
 
 
 def truncate(string, num):
-   if len(string) > num:
-      string = string[0:num]
-      i = string.rfind('.')
+    if len(string) <= num:
+        return string
 
-      if i != -1:
-         string = string[0:i + 1]
+    # Search for the last period within the first num characters without
+    # slicing the string first, so only one copy is made.
+    i = string.rfind('.', 0, num)
 
-   return string
+    if i == -1:
+        return string[:num]
+    else:
+        return string[:i + 1]
 
 
 class Group(models.Model):
@@ -112,7 +172,7 @@ class Group(models.Model):
         return (not self.invite_only or
                 user.is_superuser or
                 (user.is_authenticated() and
-                 self.users.filter(pk=user.pk).count() > 0))
+                 self.users.filter(pk=user.pk).exists()))
 
     def __unicode__(self):
         return self.name
@@ -165,6 +225,148 @@ class DefaultReviewer(models.Model):
     def __unicode__(self):
         return self.name
 
+    def get_file_regex(self):
+        """Returns the compiled regular expression for file_regex.
+
+        Compiled expressions are cached across calls, so that matching
+        files against the same DefaultReviewer doesn't require compiling
+        the pattern every time. This will raise re.error if the pattern
+        is invalid.
+        """
+        key = (self.pk, self.file_regex)
+
+        try:
+            return _default_reviewer_regex_cache[key]
+        except KeyError:
+            regex = re.compile(self.file_regex)
+
+            if self.pk is not None:
+                _default_reviewer_regex_cache[key] = regex
+
+            return regex
+
+
+def _clear_default_reviewer_regex_cache(sender, instance, **kwargs):
+    """Removes any cached regexes for a saved or deleted DefaultReviewer."""
+    for key in _default_reviewer_regex_cache.keys():
+        if key[0] == instance.pk:
+            del _default_reviewer_regex_cache[key]
+
+post_save.connect(_clear_default_reviewer_regex_cache, sender=DefaultReviewer)
+post_delete.connect(_clear_default_reviewer_regex_cache,
+                    sender=DefaultReviewer)
+
+
+def _get_combined_file_regex(repository, defaults):
+    """Returns a regex matching any of the given DefaultReviewers' patterns.
+
+    The result is cached for the repository until its list of
+    DefaultReviewers or their patterns change. This returns None if the
+    patterns can't be safely combined.
+    """
+    if repository:
+        repository_id = repository.pk
+    else:
+        repository_id = None
+
+    key = tuple([
+        (default.pk, default.file_regex)
+        for default, regex in defaults
+    ])
+
+    try:
+        cached_key, combined = \
+            _default_reviewer_combined_regex_cache[repository_id]
+
+        if cached_key == key:
+            return combined
+    except KeyError:
+        pass
+
+    combined = None
+
+    for default, regex in defaults:
+        if _UNCOMBINABLE_FILE_REGEX_RE.search(default.file_regex):
+            break
+    else:
+        try:
+            combined = re.compile('|'.join([
+                '(?:%s)' % default.file_regex
+                for default, regex in defaults
+            ]))
+        except (re.error, AssertionError):
+            # Python 2's re module raises an AssertionError when a pattern
+            # has more than 100 groups, which the DefaultReviewers' patterns
+            # can add up to when combined. They're matched one at a time
+            # in that case.
+            pass
+
+    _default_reviewer_combined_regex_cache[repository_id] = (key, combined)
+
+    return combined
+
+
+def _get_matching_default_reviewers(repository, defaults, files):
+    """Returns the DefaultReviewers matching any of the given files.
+
+    ``defaults`` is a list of (DefaultReviewer, compiled file regex) tuples,
+    and ``files`` is a list of (source_file, dest_file) tuples.
+    Each file is first matched against a single alternation of all the
+    patterns, so files that no DefaultReviewer cares about only cost one
+    match instead of one per DefaultReviewer.
+    """
+    combined = _get_combined_file_regex(repository, defaults)
+    matched = []
+    remaining = list(defaults)
+    filenames = set()
+
+    for source_file, dest_file in files:
+        filename = source_file or dest_file
+
+        if filename in filenames:
+            continue
+
+        filenames.add(filename)
+
+        if combined is not None and not combined.match(filename):
+            continue
+
+        for default, regex in remaining[:]:
+            if regex.match(filename):
+                matched.append(default)
+                remaining.remove((default, regex))
+
+        if not remaining:
+            # Every DefaultReviewer has matched, so there's nothing left
+            # to find in the rest of the files.
+            break
+
+    return matched
+
+
+def _add_default_reviewer_targets(obj, default_ids):
+    """Adds the people and groups of the given DefaultReviewers as targets.
+
+    ``obj`` is a ReviewRequest or ReviewRequestDraft. The reviewers for all
+    the DefaultReviewers are fetched at once, and only as IDs, since that's
+    all that's needed to add the ones that aren't already targets.
+    """
+    people_ids = set(User.objects.filter(
+        default_review_paths__in=default_ids).values_list('pk', flat=True))
+    people_ids.difference_update(
+        obj.target_people.values_list('pk', flat=True))
+
+    if people_ids:
+        obj.target_people.add(*people_ids)
+
+    group_ids = set(Group.objects.filter(
+        defaultreviewer__in=default_ids).values_list('pk', flat=True))
+    group_ids.difference_update(
+        obj.target_groups.values_list('pk', flat=True))
+
+    if group_ids:
+        obj.target_groups.add(*group_ids)
+
 
 class Screenshot(models.Model):
     """
@@ -199,19 +401,34 @@ class Screenshot(models.Model):
         return u"%s (%s)" % (self.caption, self.image)
 
     def get_review_request(self):
-        try:
-            return self.review_request.all()[0]
-        except IndexError:
-            try:
-                return self.inactive_review_request.all()[0]
-            except IndexError:
-                # Maybe it's on a draft.
-                try:
-                    draft = self.drafts.get()
-                except ReviewRequestDraft.DoesNotExist:
-                    draft = self.inactive_drafts.get()
-
-                return draft.review_request
+        # The screenshot may be active or inactive on either the review
+        # request or its draft. Look in all four places in one query,
+        # rather than trying each in turn.
+        return ReviewRequest.objects.extra(where=["""
+            reviews_reviewrequest.id IN (
+                SELECT reviewrequest_id
+                  FROM reviews_reviewrequest_screenshots
+                  WHERE screenshot_id = %(screenshot_id)d
+                UNION ALL
+                SELECT reviewrequest_id
+                  FROM reviews_reviewrequest_inactive_screenshots
+                  WHERE screenshot_id = %(screenshot_id)d
+                UNION ALL
+                SELECT draft.review_request_id
+                  FROM reviews_reviewrequestdraft draft,
+                       reviews_reviewrequestdraft_screenshots screenshots
+                  WHERE draft.id = screenshots.reviewrequestdraft_id
+                    AND screenshots.screenshot_id = %(screenshot_id)d
+                UNION ALL
+                SELECT draft.review_request_id
+                  FROM reviews_reviewrequestdraft draft,
+                       reviews_reviewrequestdraft_inactive_screenshots
+                       screenshots
+                  WHERE draft.id = screenshots.reviewrequestdraft_id
+                    AND screenshots.screenshot_id = %(screenshot_id)d)
+            """ % {
+                'screenshot_id': self.pk,
+            }]).get()
 
     def get_absolute_url(self):
         review_request = self.get_review_request()
@@ -230,24 +447,11 @@ class Screenshot(models.Model):
             })
 
     def save(self, **kwargs):
-        super(Screenshot, self).save()
+        super(Screenshot, self).save(**kwargs)
 
-        try:
-            draft = self.drafts.get()
-            draft.timestamp = datetime.now()
-            draft.save()
-        except ReviewRequestDraft.DoesNotExist:
-            pass
-
-    def save(self, **kwargs):
-        super(Screenshot, self).save()
-
-        try:
-            draft = self.drafts.get()
-            draft.timestamp = datetime.now()
-            draft.save()
-        except ReviewRequestDraft.DoesNotExist:
-            pass
+        # Bump the timestamp on any draft this screenshot is part of. This is
+        # a single UPDATE, whether or not there's a draft.
+        self.drafts.update(last_updated=datetime.now())
 
 
 class ReviewRequest(models.Model):
@@ -355,10 +559,11 @@ class ReviewRequest(models.Model):
         Returns a list of all people who have been involved in discussing
         this review request.
         """
-        # See the comment in Review.get_participants for this list
-        # comprehension.
-        return [u for review in self.reviews.all()
-                  for u in review.participants]
+        # The participants are recorded in ReviewRequestParticipant as
+        # reviews and replies are created, so this is a single query rather
+        # than a walk over every review and reply.
+        return list(User.objects.filter(
+            review_request_participations__review_request=self))
 
     participants = property(get_participants)
 
@@ -366,20 +571,7 @@ class ReviewRequest(models.Model):
         """
         Returns a sorted list of bugs associated with this review request.
         """
-        if self.bugs_closed == "":
-            return []
-
-        bugs = re.split(r"[, ]+", self.bugs_closed)
-
-        # First try a numeric sort, to show the best results for the majority
-        # case of bug trackers with numeric IDs.  If that fails, sort
-        # alphabetically.
-        try:
-            bugs.sort(cmp=lambda x,y: cmp(int(x), int(y)))
-        except ValueError:
-            bugs.sort()
-
-        return bugs
+        return _get_bug_list(self.bugs_closed)
 
     def get_new_reviews(self, user):
         """
@@ -416,38 +608,37 @@ class ReviewRequest(models.Model):
         the set of files in the diff.
         """
 
-        if self.diffset_history.diffsets.count() != 1:
+        # Most repositories have no default reviewers, so check for those
+        # before looking at the diff.
+        defaults = [
+            (default, default.get_file_regex())
+            for default in DefaultReviewer.objects.for_repository(
+                self.repository)
+        ]
+
+        if not defaults:
             return
 
-        diffset = self.diffset_history.diffsets.get()
+        # Fetch at most two diffsets. That's enough to tell whether there's
+        # exactly one, and saves a separate COUNT query.
+        diffsets = list(self.diffset_history.diffsets.all()[:2])
 
-        people = set()
-        groups = set()
+        if len(diffsets) != 1:
+            return
 
-        # TODO: This is kind of inefficient, and could maybe be optimized in
-        # some fancy way.  Certainly the most superficial optimization that
-        # could be made would be to cache the compiled regexes somewhere.
-        files = diffset.files.all()
-        for default in DefaultReviewer.objects.for_repository(self.repository):
-            regex = re.compile(default.file_regex)
+        diffset = diffsets[0]
 
-            for filediff in files:
-                if regex.match(filediff.source_file or filediff.dest_file):
-                    for person in default.people.all():
-                        people.add(person)
-                    for group in default.groups.all():
-                        groups.add(group)
-                    break
+        default_ids = [
+            default.pk
+            for default in _get_matching_default_reviewers(
+                self.repository, defaults,
+                diffset.files.values_list('source_file', 'dest_file'))
+        ]
 
-        existing_people = self.target_people.all()
-        for person in people:
-            if person not in existing_people:
-                self.target_people.add(person)
+        if not default_ids:
+            return
 
-        existing_groups = self.target_groups.all()
-        for group in groups:
-            if group not in existing_groups:
-                self.target_groups.add(group)
+        _add_default_reviewer_targets(self, default_ids)
 
     def get_display_id(self):
         """Gets the ID which should be exposed to the user."""
@@ -462,9 +653,12 @@ class ReviewRequest(models.Model):
         """
         Returns all public top-level reviews for this review request.
         """
-        return [review for review in
-            self.reviews.filter(public=True, base_reply_to__isnull=True)
-            if review.is_accessible_by(request_user)]
+        return list(
+            Review.objects.accessible(request_user).filter(
+                review_request=self,
+                public=True,
+                base_reply_to__isnull=True).select_related('user',
+                                                           'review_request'))
 
     def update_from_changenum(self, changenum):
         """
@@ -489,7 +683,26 @@ class ReviewRequest(models.Model):
           * The user is listed as a requested reviewer or the user has access
             to one or more groups listed as requested reviewers (either by
             being a member of an invite-only group, or the group being public).
+
+        The result is cached on this instance for each user and LocalSite,
+        until the review request is next saved.
         """
+        if local_site:
+            key = (user.id, local_site.pk)
+        else:
+            key = (user.id, None)
+
+        if not hasattr(self, '_accessible_by_cache'):
+            self._accessible_by_cache = {}
+
+        if key not in self._accessible_by_cache:
+            self._accessible_by_cache[key] = \
+                self._is_accessible_by(user, local_site)
+
+        return self._accessible_by_cache[key]
+
+    def _is_accessible_by(self, user, local_site):
+        """Performs the access checks for is_accessible_by."""
         if not self.public and not self.is_mutable_by(user):
             return False
 
@@ -499,37 +712,48 @@ class ReviewRequest(models.Model):
         if local_site and not local_site.is_accessible_by(user):
             return False
 
-        if (user.is_authenticated() and
-            self.target_people.filter(pk=user.pk).count() > 0):
+        # If the user submitted the review request (or it was submitted as the
+        # user) then it should obviously be OK for the user to see the review
+        # request.
+        if self.submitter_id == user.id:
             return True
 
-        groups = list(self.target_groups.all())
+        # The user has access if they're a target reviewer, if there are no
+        # target groups, or if they can access one of the target groups
+        # (either by being a member of an invite-only group, or the group
+        # being public). These are all checked in a single query.
+        #
+        # The group conditions mirror Group.is_accessible_by. They're all in
+        # one filter() call, so they apply to the same target group.
+        q = Q(target_groups__isnull=True)
 
-        if not groups:
-            return True
+        if user.is_authenticated():
+            group_q = (Q(target_groups__local_site__isnull=True) |
+                       Q(target_groups__local_site__users__pk=user.pk))
 
-        # We specifically iterate over these instead of making it part
-        # of the query in order to keep the logic in Group, and to allow
-        # for future expansion (extensions, more advanced policy)
-        #
-        # We're looking for at least one group that the user has access
-        # to. If they can access any of the groups, then they have access
-        # to the review request.
-        for group in groups:
-            if group.is_accessible_by(user):
-                return True
+            if not user.is_superuser:
+                group_q = group_q & (Q(target_groups__invite_only=False) |
+                                     Q(target_groups__users__pk=user.pk))
+
+            q = q | Q(target_people__pk=user.pk) | group_q
+        else:
+            q = q | Q(target_groups__local_site__isnull=True,
+                      target_groups__invite_only=False)
+
+        if ReviewRequest.objects.filter(pk=self.pk).filter(q).exists():
+            return True
 
         # If the submitter of the review belongs to a review group, to which
         # the current user also belongs, then we allow them to see the review
         # request.
-        for group in Group.objects.accessible(self.submitter):
-            if group.is_accessible_by(user):
-                return True
+        #
+        # Both lists only contain groups outside of any LocalSite, where
+        # Group.objects.accessible matches Group.is_accessible_by.
+        user_group_ids = Group.objects.accessible(
+            user, visible_only=False).values('pk')
 
-        # If the user submitted the review request (or it was submitted as the
-        # user) then it should obviously be OK for the user to see the review
-        # request.
-        if self.submitter == user:
+        if Group.objects.accessible(self.submitter).filter(
+            pk__in=user_group_ids).exists():
             return True
 
         return False
@@ -569,30 +793,76 @@ class ReviewRequest(models.Model):
         review request has been made public more recently.
         """
         timestamp = self.last_updated
-        updated_object = self
+        updated_model = ReviewRequest
+        diffset_timestamp, review_timestamp = self._get_activity_timestamps()
 
         # Check if the diff was updated along with this.
-        try:
-            diffset = self.diffset_history.diffsets.latest()
-
-            if diffset.timestamp >= timestamp:
-                timestamp = diffset.timestamp
-                updated_object = diffset
-        except DiffSet.DoesNotExist:
-            pass
+        if diffset_timestamp is not None and diffset_timestamp >= timestamp:
+            timestamp = diffset_timestamp
+            updated_model = DiffSet
 
         # Check for the latest review or reply.
-        try:
-            review = self.reviews.filter(public=True).latest()
-
-            if review.timestamp >= timestamp:
-                timestamp = review.timestamp
-                updated_object = review
-        except Review.DoesNotExist:
-            pass
+        if review_timestamp is not None and review_timestamp >= timestamp:
+            timestamp = review_timestamp
+            updated_model = Review
+
+        # Only the most recently updated object needs to be fetched.
+        if updated_model is DiffSet:
+            updated_object = self.diffset_history.diffsets.latest()
+        elif updated_model is Review:
+            updated_object = self.reviews.filter(public=True).latest()
+        else:
+            updated_object = self
 
         return timestamp, updated_object
 
+    def get_last_activity_timestamp(self):
+        """Returns the timestamp of the last public activity.
+
+        This is equivalent to the timestamp returned by get_last_activity,
+        but doesn't need to fetch the updated object.
+        """
+        timestamp = self.last_updated
+
+        for activity_timestamp in self._get_activity_timestamps():
+            if (activity_timestamp is not None and
+                activity_timestamp >= timestamp):
+                timestamp = activity_timestamp
+
+        return timestamp
+
+    def _get_activity_timestamps(self):
+        """Returns the timestamps of the latest diff and public review.
+
+        Both timestamps are looked up in a single query. Either may be
+        None if there's no diff or public review.
+        """
+        diffset_timestamp, review_timestamp = \
+            ReviewRequest.objects.filter(pk=self.pk).extra(select={
+                'diffset_timestamp': """
+                    SELECT diffviewer_diffset.timestamp
+                      FROM diffviewer_diffset
+                      WHERE diffviewer_diffset.history_id =
+                            reviews_reviewrequest.diffset_history_id
+                      ORDER BY diffviewer_diffset.revision DESC
+                      LIMIT 1
+                """,
+                'review_timestamp': """
+                    SELECT MAX(reviews_review.timestamp)
+                      FROM reviews_review
+                      WHERE reviews_review.public
+                        AND reviews_review.review_request_id =
+                            reviews_reviewrequest.id
+                """,
+            }).values_list('diffset_timestamp', 'review_timestamp')[0]
+
+        # Values from extra selects aren't converted by the database
+        # backend, so some databases will hand back strings.
+        return (DiffSet._meta.get_field('timestamp').to_python(
+                    diffset_timestamp),
+                Review._meta.get_field('timestamp').to_python(
+                    review_timestamp))
+
     def changeset_is_pending(self):
         """
         Returns True if the current changeset associated with this review
@@ -635,45 +905,22 @@ class ReviewRequest(models.Model):
             # and all ReviewRequestVisit objects.
             self.visits.all().delete()
 
+        # Access may have changed along with the review request's state
+        # or reviewers.
+        self._accessible_by_cache = {}
+
         super(ReviewRequest, self).save(**kwargs)
 
+    @_commit_on_success_unless_managed
     def delete(self, **kwargs):
-        from reviewboard.accounts.models import Profile, LocalSiteProfile
-
-        profile, profile_is_new = \
-            Profile.objects.get_or_create(user=self.submitter)
-
-        if profile_is_new:
-            profile.save()
-
-        local_site = self.local_site
-        site_profile, site_profile_is_new = \
-            LocalSiteProfile.objects.get_or_create(user=self.submitter,
-                                                   profile=profile,
-                                                   local_site=local_site)
-
+        site_profile = self._get_submitter_site_profile()
         site_profile.decrement_total_outgoing_request_count()
 
         if self.status == self.PENDING_REVIEW:
             site_profile.decrement_pending_outgoing_request_count()
 
         if self.public:
-            people = self.target_people.all()
-            groups = self.target_groups.all()
-
-            Group.incoming_request_count.decrement(groups)
-            LocalSiteProfile.direct_incoming_request_count.decrement(
-                LocalSiteProfile.objects.filter(user__in=people,
-                                                local_site=local_site))
-            LocalSiteProfile.total_incoming_request_count.decrement(
-                LocalSiteProfile.objects.filter(
-                    Q(local_site=local_site) &
-                    Q(Q(user__review_groups__in=groups) |
-                      Q(user__in=people))))
-            LocalSiteProfile.starred_public_request_count.decrement(
-                LocalSiteProfile.objects.filter(
-                    profile__starred_review_requests=self,
-                    local_site=local_site))
+            self._update_incoming_counts(-1)
 
         super(ReviewRequest, self).delete(**kwargs)
 
@@ -697,7 +944,7 @@ class ReviewRequest(models.Model):
             changedesc.record_field_change('status', self.status, type)
             changedesc.save()
 
-            self.changedescs.add(changedesc)
+            self._add_changedesc(changedesc)
             self.status = type
             self.save(update_counts=True)
 
@@ -744,7 +991,7 @@ class ReviewRequest(models.Model):
             else:
                 changedesc.public = True
                 changedesc.save()
-                self.changedescs.add(changedesc)
+                self._add_changedesc(changedesc)
 
             self.status = self.PENDING_REVIEW
             self.save(update_counts=True)
@@ -752,6 +999,17 @@ class ReviewRequest(models.Model):
         review_request_reopened.send(sender=self.__class__, user=user,
                                      review_request=self)
 
+    def _add_changedesc(self, changedesc):
+        """Attaches a newly saved ChangeDescription to this review request.
+
+        A new change description can't already be attached, so this inserts
+        the relation directly. changedescs.add() would first query for
+        existing relations before inserting.
+        """
+        ReviewRequest.changedescs.through.objects.create(
+            reviewrequest=self,
+            changedescription=changedesc)
+
     def update_changenum(self,changenum, user=None):
         if (user and not self.is_mutable_by(user)):
             raise PermissionError
@@ -760,8 +1018,6 @@ class ReviewRequest(models.Model):
         self.save()
 
     def publish(self, user):
-        from reviewboard.accounts.models import LocalSiteProfile
-
         """
         Save the current draft attached to this review request. Send out the
         associated email. Returns the review request that was saved.
@@ -769,6 +1025,21 @@ class ReviewRequest(models.Model):
         if not self.is_mutable_by(user):
             raise PermissionError
 
+        changes = self._publish()
+
+        review_request_published.send(sender=self.__class__, user=user,
+                                      review_request=self,
+                                      changedesc=changes)
+
+    @_commit_on_success_unless_managed
+    def _publish(self):
+        """
+        Publishes the draft and updates the counters for publish().
+
+        This all happens in one transaction, so the many small writes are
+        committed together, and the counters can't be left half-updated.
+        Returns the draft's ChangeDescription, if any.
+        """
         # Decrement the counts on everything. we lose them.
         # We'll increment the resulting set during ReviewRequest.save.
         # This should be done before the draft is published.
@@ -776,22 +1047,12 @@ class ReviewRequest(models.Model):
         # and groups will be updated with new values.
         # Decrement should not happen while publishing
         # a new request or a discarded request
+        #
+        # The starred counts are left alone here, and aren't incremented
+        # again in _update_counts, since republishing doesn't change who
+        # has starred the review request.
         if self.public:
-            Group.incoming_request_count.decrement(self.target_groups.all())
-            LocalSiteProfile.direct_incoming_request_count.decrement(
-                    LocalSiteProfile.objects.filter(
-                        user__in=self.target_people.all(),
-                        local_site=self.local_site))
-            LocalSiteProfile.total_incoming_request_count.decrement(
-                    LocalSiteProfile.objects.filter(
-                        Q(local_site=self.local_site) &
-                        Q(Q(user__review_groups__in= \
-                            self.target_groups.all()) |
-                          Q(user__in=self.target_people.all()))))
-            LocalSiteProfile.starred_public_request_count.decrement(
-                    LocalSiteProfile.objects.filter(
-                        profile__starred_review_requests=self,
-                        local_site=self.local_site))
+            self._update_incoming_counts(-1, update_starred=False)
 
         draft = get_object_or_none(self.draft)
         if draft is not None:
@@ -804,27 +1065,49 @@ class ReviewRequest(models.Model):
         self.public = True
         self.save(update_counts=True)
 
-        review_request_published.send(sender=self.__class__, user=user,
-                                      review_request=self,
-                                      changedesc=changes)
+        return changes
 
-    def _update_counts(self):
-        from reviewboard.accounts.models import Profile, LocalSiteProfile
+    def _update_incoming_counts(self, delta, update_starred=True):
+        """Adjusts the counters that track this review request as incoming.
 
-        profile, profile_is_new = \
-            Profile.objects.get_or_create(user=self.submitter)
+        This adds ``delta`` to the incoming counts of the target groups and
+        to the incoming and starred counts of the affected users' profiles.
+        The starred counts are skipped if ``update_starred`` is False.
+        """
+        from reviewboard.accounts.models import LocalSiteProfile
+
+        # Both updates need the target groups, so only look them up once.
+        group_ids = list(self.target_groups.values_list('pk', flat=True))
 
-        if profile_is_new:
-            profile.save()
+        Group.objects.update_review_request_counts(group_ids, delta)
+        LocalSiteProfile.objects.update_review_request_counts(
+            self, delta, group_ids, update_starred=update_starred)
 
-        local_site = self.local_site
-        site_profile, site_profile_is_new = \
-            LocalSiteProfile.objects.get_or_create(user=self.submitter,
-                                              profile=profile,
-                                              local_site=local_site)
+    def _get_submitter_site_profile(self):
+        """Returns the submitter's LocalSiteProfile, creating it if needed.
 
-        if site_profile_is_new:
-            site_profile.save()
+        The profile almost always exists already, so this looks it up
+        directly and only falls back on creating the Profile and
+        LocalSiteProfile when it's missing.
+        """
+        from reviewboard.accounts.models import Profile, LocalSiteProfile
+
+        try:
+            return LocalSiteProfile.objects.get(user=self.submitter_id,
+                                                local_site=self.local_site_id)
+        except LocalSiteProfile.DoesNotExist:
+            profile, profile_is_new = \
+                Profile.objects.get_or_create(user=self.submitter)
+            site_profile, site_profile_is_new = \
+                LocalSiteProfile.objects.get_or_create(
+                    user=self.submitter,
+                    profile=profile,
+                    local_site=self.local_site)
+
+            return site_profile
+
+    def _update_counts(self):
+        site_profile = self._get_submitter_site_profile()
 
         if self.id is None:
             # This hasn't been created yet. Bump up the outgoing request
@@ -834,53 +1117,28 @@ class ReviewRequest(models.Model):
             old_public = False
         else:
             # We need to see if the status has changed, so that means
-            # finding out what's in the database.
-            r = ReviewRequest.objects.get(pk=self.id)
-            old_status = r.status
-            old_public = r.public
+            # finding out what's in the database. Only the two fields we
+            # compare against are fetched.
+            old_status, old_public = ReviewRequest.objects.filter(
+                pk=self.id).values_list('status', 'public')[0]
 
         if self.status == self.PENDING_REVIEW:
             if old_status != self.status:
                 site_profile.increment_pending_outgoing_request_count()
 
             if self.public and self.id is not None:
-                groups = self.target_groups.all()
-                people = self.target_people.all()
-
-                Group.incoming_request_count.increment(groups)
-                LocalSiteProfile.direct_incoming_request_count.increment(
-                    LocalSiteProfile.objects.filter(user__in=people,
-                                                    local_site=local_site))
-                LocalSiteProfile.total_incoming_request_count.increment(
-                    LocalSiteProfile.objects.filter(
-                        Q(local_site=local_site) &
-                        Q(Q(user__review_groups__in=groups) |
-                          Q(user__in=people))))
-                LocalSiteProfile.starred_public_request_count.increment(
-                    LocalSiteProfile.objects.filter(
-                        profile__starred_review_requests=self,
-                        local_site=local_site))
+                # If this was already public and pending, this is a
+                # republish, and the starred counts were never decremented.
+                self._update_incoming_counts(
+                    1,
+                    update_starred=not (old_public and
+                                        old_status == self.PENDING_REVIEW))
         else:
             if old_status != self.status:
                 site_profile.decrement_pending_outgoing_request_count()
 
             if old_public:
-                groups = self.target_groups.all()
-                people = self.target_people.all()
-
-                Group.incoming_request_count.decrement(groups)
-                LocalSiteProfile.direct_incoming_request_count.decrement(
-                    LocalSiteProfile.objects.filter(user__in=people,
-                                                    local_site=local_site))
-                LocalSiteProfile.total_incoming_request_count.decrement(
-                    LocalSiteProfile.objects.filter(
-                        Q(local_site=local_site) &
-                        Q(Q(user__review_groups__in=groups) |
-                          Q(user__in=people))))
-                LocalSiteProfile.starred_public_request_count.decrement(
-                    LocalSiteProfile.objects.filter(
-                        profile__starred_review_requests=self,
-                        local_site=local_site))
+                self._update_incoming_counts(-1)
 
     class Meta:
         ordering = ['-last_updated', 'submitter', 'summary']
@@ -956,20 +1214,7 @@ class ReviewRequestDraft(models.Model):
         """
         Returns a sorted list of bugs associated with this review request.
         """
-        if self.bugs_closed == "":
-            return []
-
-        bugs = re.split(r"[, ]+", self.bugs_closed)
-
-        # First try a numeric sort, to show the best results for the majority
-        # case of bug trackers with numeric IDs.  If that fails, sort
-        # alphabetically.
-        try:
-            bugs.sort(cmp=lambda x,y: cmp(int(x), int(y)))
-        except ValueError:
-            bugs.sort()
-
-        return bugs
+        return _get_bug_list(self.bugs_closed)
 
     def __unicode__(self):
         return self.summary
@@ -1005,29 +1250,18 @@ class ReviewRequestDraft(models.Model):
             draft.changedesc = changedesc
 
         if draft_is_new:
-            map(draft.target_groups.add, review_request.target_groups.all())
-            map(draft.target_people.add, review_request.target_people.all())
-            for screenshot in review_request.screenshots.all():
-                screenshot.draft_caption = screenshot.caption
-                screenshot.save()
-                draft.screenshots.add(screenshot)
-
-            for screenshot in review_request.inactive_screenshots.all():
-                screenshot.draft_caption = screenshot.caption
-                screenshot.save()
-                draft.inactive_screenshots.add(screenshot)
-
-            for attachment in review_request.file_attachments.all():
-                attachment.draft_caption = attachment.caption
-                attachment.save()
-                draft.file_attachments.add(attachment)
-
-            for attachment in review_request.inactive_file_attachments.all():
-                attachment.draft_caption = attachment.caption
-                attachment.save()
-                draft.inactive_file_attachments.add(attachment)
-
-            draft.save();
+            draft.target_groups.add(*review_request.target_groups.all())
+            draft.target_people.add(*review_request.target_people.all())
+
+            # Reset the draft captions with one UPDATE per relation, rather
+            # than saving each screenshot and file attachment.
+            for name in ('screenshots', 'inactive_screenshots',
+                         'file_attachments', 'inactive_file_attachments'):
+                items = getattr(review_request, name)
+                items.update(draft_caption=F('caption'))
+                getattr(draft, name).add(*items.all())
+
+            draft.save()
 
         return draft
 
@@ -1040,40 +1274,32 @@ class ReviewRequestDraft(models.Model):
         the set of files in the diff.
         """
 
-        if not self.diffset:
+        if not self.diffset_id:
             return
 
         repository = self.review_request.repository
-        people = set()
-        groups = set()
+        defaults = []
 
-        # TODO: This is kind of inefficient, and could maybe be optimized in
-        # some fancy way.  Certainly the most superficial optimization that
-        # could be made would be to cache the compiled regexes somewhere.
-        files = self.diffset.files.all()
         for default in DefaultReviewer.objects.for_repository(repository):
             try:
-                regex = re.compile(default.file_regex)
+                defaults.append((default, default.get_file_regex()))
             except:
                 continue
 
-            for filediff in files:
-                if regex.match(filediff.source_file or filediff.dest_file):
-                    for person in default.people.all():
-                        people.add(person)
-                    for group in default.groups.all():
-                        groups.add(group)
-                    break
+        if not defaults:
+            return
+
+        default_ids = [
+            default.pk
+            for default in _get_matching_default_reviewers(
+                repository, defaults,
+                self.diffset.files.values_list('source_file', 'dest_file'))
+        ]
 
-        existing_people = self.target_people.all()
-        for person in people:
-            if person not in existing_people:
-                self.target_people.add(person)
+        if not default_ids:
+            return
 
-        existing_groups = self.target_groups.all()
-        for group in groups:
-            if group not in existing_groups:
-                self.target_groups.add(group)
+        _add_default_reviewer_targets(self, default_ids)
 
     def publish(self, review_request=None, user=None,
                 send_notification=True):
@@ -1138,17 +1364,32 @@ class ReviewRequestDraft(models.Model):
 
                 a.__dict__[name] = value
 
-        def update_list(a, b, name, record_changes=True, name_field=None):
-            aset = set([x.id for x in a.all()])
-            bset = set([x.id for x in b.all()])
+        def update_list(a, b, name, record_changes=True, name_field=None,
+                        a_items=None):
+            # Fetch both lists once and reuse them below, rather than
+            # re-running the query for every use. The caller may pass in
+            # the current list if it has already fetched it.
+            if a_items is None:
+                a_items = list(a.all())
+
+            b_items = list(b.all())
+            aset = set([x.id for x in a_items])
+            bset = set([x.id for x in b_items])
 
             if aset.symmetric_difference(bset):
                 if record_changes and self.changedesc:
-                    self.changedesc.record_field_change(name, a.all(), b.all(),
+                    self.changedesc.record_field_change(name, a_items, b_items,
                                                         name_field)
 
-                a.clear()
-                map(a.add, b.all())
+                # Only touch the relations that actually changed.
+                removed_ids = aset - bset
+                added_ids = bset - aset
+
+                if removed_ids:
+                    a.remove(*removed_ids)
+
+                if added_ids:
+                    a.add(*added_ids)
 
         update_field(review_request, self, 'summary')
         update_field(review_request, self, 'description')
@@ -1175,57 +1416,68 @@ class ReviewRequestDraft(models.Model):
 
         # Screenshots are a bit special.  The list of associated screenshots can
         # change, but so can captions within each screenshot.
-        screenshots = self.screenshots.all()
+        screenshot_ids = set(self.screenshots.values_list('pk', flat=True))
+        old_screenshots = list(review_request.screenshots.all())
         caption_changes = {}
 
-        for s in review_request.screenshots.all():
-            if s in screenshots and s.caption != s.draft_caption:
+        for s in old_screenshots:
+            if s.pk in screenshot_ids and s.caption != s.draft_caption:
                 caption_changes[s.id] = {
                     'old': (s.caption,),
                     'new': (s.draft_caption,),
                 }
 
                 s.caption = s.draft_caption
-                s.save()
 
-        if caption_changes and self.changedesc:
-            self.changedesc.fields_changed['screenshot_captions'] = \
-                caption_changes
+        if caption_changes:
+            # Save all the new captions in one UPDATE.
+            Screenshot.objects.filter(pk__in=caption_changes.keys()).update(
+                caption=F('draft_caption'))
+
+            if self.changedesc:
+                self.changedesc.fields_changed['screenshot_captions'] = \
+                    caption_changes
 
         update_list(review_request.screenshots, self.screenshots,
-                    'screenshots', name_field="caption")
+                    'screenshots', name_field="caption",
+                    a_items=old_screenshots)
 
         # There's no change notification required for this field.
-        review_request.inactive_screenshots.clear()
-        map(review_request.inactive_screenshots.add,
-            self.inactive_screenshots.all())
+        update_list(review_request.inactive_screenshots,
+                    self.inactive_screenshots, 'inactive_screenshots',
+                    record_changes=False)
 
         # Files are treated like screenshots. The list of files can
         # change, but so can captions within each file.
-        files = self.file_attachments.all()
+        file_ids = set(self.file_attachments.values_list('pk', flat=True))
+        old_files = list(review_request.file_attachments.all())
         caption_changes = {}
 
-        for f in review_request.file_attachments.all():
-            if f in files and f.caption != f.draft_caption:
+        for f in old_files:
+            if f.pk in file_ids and f.caption != f.draft_caption:
                 caption_changes[f.id] = {
                     'old': (f.caption,),
                     'new': (f.draft_caption,),
                 }
 
                 f.caption = f.draft_caption
-                f.save()
 
-        if caption_changes and self.changedesc:
-            self.changedesc.fields_changed['file_captions'] = \
-                caption_changes
+        if caption_changes:
+            FileAttachment.objects.filter(
+                pk__in=caption_changes.keys()).update(
+                    caption=F('draft_caption'))
+
+            if self.changedesc:
+                self.changedesc.fields_changed['file_captions'] = \
+                    caption_changes
 
         update_list(review_request.file_attachments, self.file_attachments,
-                    'files', name_field="caption")
+                    'files', name_field="caption", a_items=old_files)
 
         # There's no change notification required for this field.
-        review_request.inactive_file_attachments.clear()
-        map(review_request.inactive_file_attachments.add,
-            self.inactive_file_attachments.all())
+        update_list(review_request.inactive_file_attachments,
+                    self.inactive_file_attachments, 'inactive_files',
+                    record_changes=False)
 
         if self.diffset:
             if self.changedesc:
@@ -1321,17 +1573,11 @@ class BaseComment(models.Model):
 
         super(BaseComment, self).save()
 
-        try:
-            # Update the review timestamp, but only if it's a draft.
-            # Otherwise, resolving an issue will change the timestamp of
-            # the review.
-            review = self.review.get()
-
-            if not review.public:
-                review.timestamp = self.timestamp
-                review.save()
-        except Review.DoesNotExist:
-            pass
+        # Update the review timestamp, but only if it's a draft.
+        # Otherwise, resolving an issue will change the timestamp of
+        # the review. This is a single UPDATE, which matches nothing if
+        # the comment isn't on a draft review.
+        self.review.filter(public=False).update(timestamp=self.timestamp)
 
     class Meta:
         abstract = True
@@ -1574,15 +1820,12 @@ class Review(models.Model):
         this review.
         """
 
-        # This list comprehension gives us every user in every reply,
-        # recursively.  It looks strange and perhaps backwards, but
-        # works. We do it this way because get_participants gives us a
-        # list back, which we can't stick in as the result for a
-        # standard list comprehension. We could opt for a simple for
-        # loop and concetenate the list, but this is more fun.
+        # Every reply in a discussion points back to the top-most review
+        # through base_reply_to, so replies never have replies of their
+        # own. That means the authors of this review's replies are all the
+        # participants, and can be loaded along with the replies.
         return [self.user] + \
-               [u for reply in self.replies.all()
-                  for u in reply.participants]
+               [reply.user for reply in self.replies.select_related('user')]
 
     participants = property(get_participants)
 
@@ -1593,14 +1836,17 @@ class Review(models.Model):
         """
         Returns whether or not this review is a reply to another review.
         """
-        return self.base_reply_to != None
+        return self.base_reply_to_id is not None
     is_reply.boolean = True
 
     def public_replies(self):
         """
         Returns a list of public replies to this review.
+
+        The authors are loaded along with the replies, since anything
+        showing the replies shows who wrote them.
         """
-        return self.replies.filter(public=True)
+        return self.replies.filter(public=True).select_related('user')
 
     def get_pending_reply(self, user):
         """
@@ -1608,15 +1854,25 @@ class Review(models.Model):
         user, if any.
         """
         if user.is_authenticated():
-            return get_object_or_none(Review,
-                                      user=user,
-                                      public=False,
-                                      base_reply_to=self)
+            # Only the fields needed to identify the reply and build its
+            # URL are loaded. The reply's text isn't needed here.
+            try:
+                return Review.objects.only(
+                    'id', 'public', 'user', 'review_request',
+                    'base_reply_to').get(user=user,
+                                         public=False,
+                                         base_reply_to=self)
+            except Review.DoesNotExist:
+                pass
 
         return None
 
     def save(self, **kwargs):
-        self.timestamp = datetime.now()
+        # Draft reviews are stamped on every save, so that the timestamp
+        # tracks the last edit. Published reviews keep the timestamp they
+        # were published with.
+        if self.pk is None or not self.public:
+            self.timestamp = datetime.now()
 
         super(Review, self).save()
 
@@ -1630,36 +1886,54 @@ class Review(models.Model):
         if not user:
             user = self.user
 
-        self.public = True
-        self.save()
+        self._publish()
 
-        for comment in self.comments.all():
-            comment.timetamp = self.timestamp
-            comment.save()
+        if self.is_reply():
+            reply_published.send(sender=self.__class__,
+                                 user=user, reply=self)
+        else:
+            review_published.send(sender=self.__class__,
+                                  user=user, review=self)
 
-        for comment in self.screenshot_comments.all():
-            comment.timetamp = self.timestamp
-            comment.save()
+    @_commit_on_success_unless_managed
+    def _publish(self):
+        """
+        Saves the review as public and updates its comments and review
+        request for publish().
 
-        for comment in self.file_attachment_comments.all():
-            comment.timetamp = self.timestamp
-            comment.save()
+        This all happens in one transaction, before any signals are sent.
+        """
+        self.public = True
+        self.timestamp = datetime.now()
+        self.save()
 
-        # Update the last_updated timestamp on the review request.
-        self.review_request.last_review_timestamp = self.timestamp
-        self.review_request.save()
+        # Give every comment the review's timestamp, with one UPDATE per
+        # type of comment.
+        self.comments.all().update(timestamp=self.timestamp)
+        self.screenshot_comments.all().update(timestamp=self.timestamp)
+        self.file_attachment_comments.all().update(timestamp=self.timestamp)
+
+        # Update the last_updated timestamp on the review request. Only
+        # the timestamps change, so they're updated directly instead of
+        # loading and re-saving the whole review request.
+        ReviewRequest.objects.filter(pk=self.review_request_id).update(
+            last_review_timestamp=self.timestamp,
+            last_updated=self.timestamp)
+
+        # Keep a review request that's already been loaded in sync, so a
+        # later save of it won't write the old timestamps back. This is
+        # checked without loading it.
+        cache_name = self._meta.get_field('review_request').get_cache_name()
+        review_request = getattr(self, cache_name, None)
+
+        if review_request is not None:
+            review_request.last_review_timestamp = self.timestamp
+            review_request.last_updated = self.timestamp
 
         # Atomicly update the shipit_count
         if self.ship_it:
             self.review_request.increment_shipit_count()
 
-        if self.is_reply():
-            reply_published.send(sender=self.__class__,
-                                 user=user, reply=self)
-        else:
-            review_published.send(sender=self.__class__,
-                                  user=user, review=self)
-
     def is_accessible_by(self, user):
         """
         This is a specific feature for using ReviewBoard as a grading tool
@@ -1671,28 +1945,36 @@ class Review(models.Model):
         extends the model with an appropriate name, but that is for later...
         """
 
+        if not hasattr(self, '_accessible_by_cache'):
+            self._accessible_by_cache = {}
+
+        if user.id not in self._accessible_by_cache:
+            self._accessible_by_cache[user.id] = self._is_accessible_by(user)
+
+        return self._accessible_by_cache[user.id]
+
+    def _is_accessible_by(self, user):
+        """Performs the access checks for is_accessible_by."""
         # There's a master switch on the review groups called
         # ready_for_reviews. The idea is that if a user is a member of a group
         # that doesn't have this switch set, then they can simply not see
         # reviews. This is a way for TAs to publish reviews and let all the
         # students see their reviews at once.
-        for group in Group.objects.accessible(user):
-            if not group.ready_for_reviews:
-                return False
+        if Group.objects.accessible(user).filter(
+            ready_for_reviews=False).exists():
+            return False
 
         # Obviously, the user who created the review request can see the
         # reviews.
-        if (self.review_request.submitter == user):
+        if self.review_request.submitter_id == user.id:
             return True
 
-        # If the requesting user is part of a review group that the user who
-        # created the review is also a part of, then we let them see the
-        # review.
-        for group in Group.objects.accessible(self.user):
-            if group.is_accessible_by(user):
-                return True
-
-        return False
+        # If the requesting user can access a review group that the user who
+        # created the review can also access, then we let them see the
+        # review. Both sides of that are checked in one query.
+        return Group.objects.accessible(self.user).filter(
+            pk__in=Group.objects.accessible(user, visible_only=False).values(
+                'pk')).exists()
 
     def delete(self):
         """
@@ -1700,14 +1982,9 @@ class Review(models.Model):
 
         This will enforce that all contained comments are also deleted.
         """
-        for comment in self.comments.all():
-            comment.delete()
-
-        for comment in self.screenshot_comments.all():
-            comment.delete()
-
-        for comment in self.file_attachment_comments.all():
-            comment.delete()
+        self.comments.all().delete()
+        self.screenshot_comments.all().delete()
+        self.file_attachment_comments.all().delete()
 
         super(Review, self).delete()
 
@@ -1717,3 +1994,43 @@ class Review(models.Model):
     class Meta:
         ordering = ['timestamp']
         get_latest_by = 'timestamp'
+
+
+class ReviewRequestParticipant(models.Model):
+    """
+    A user who has been involved in discussing a review request.
+
+    There is one of these for every user who has written a review or reply
+    on a review request. They're kept up to date as reviews are created and
+    deleted, and are used by ReviewRequest.get_participants.
+    """
+    review_request = models.ForeignKey(ReviewRequest,
+                                       related_name="participant_records")
+    user = models.ForeignKey(User,
+                             related_name="review_request_participations")
+
+    class Meta:
+        unique_together = (('review_request', 'user'),)
+
+
+def _add_review_request_participant(sender, instance, created=False,
+                                    raw=False, **kwargs):
+    """Records the author of a new review as a participant."""
+    # Raw saves come from loading fixtures. Fixtures that contain reviews
+    # need to list their participant records as well.
+    if created and not raw:
+        ReviewRequestParticipant.objects.get_or_create(
+            review_request_id=instance.review_request_id,
+            user_id=instance.user_id)
+
+
+def _remove_review_request_participant(sender, instance, **kwargs):
+    """Removes a participant once they have no reviews left."""
+    if not Review.objects.filter(review_request=instance.review_request_id,
+                                 user=instance.user_id).exists():
+        ReviewRequestParticipant.objects.filter(
+            review_request=instance.review_request_id,
+            user=instance.user_id).delete()
+
+post_save.connect(_add_review_request_participant, sender=Review)
+post_delete.connect(_remove_review_request_participant, sender=Review)
@@ -0,0 +1,4 @@
+CREATE
+	INDEX review__base_reply_to_public_user
+	ON reviews_review
+	(base_reply_to_id, public, user_id);
@@ -1,7 +1,7 @@
 import logging
 import os
 
-from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.auth.models import AnonymousUser, Permission, User
 from django.core.urlresolvers import reverse
 from django.template import Context, Template
 from django.test import TestCase
@@ -14,7 +14,8 @@ from reviewboard.reviews.models import DefaultReviewer, \
                                        Group, \
                                        ReviewRequest, \
                                        ReviewRequestDraft, \
-                                       Review
+                                       Review, \
+                                       _get_matching_default_reviewers
 from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.site.models import LocalSite
 
@@ -592,6 +593,36 @@ class DraftTests(TestCase):
         self.assertEqual(set(fields["bugs_closed"]["removed"]), old_bugs_norm)
         self.assertEqual(set(fields["bugs_closed"]["added"]), new_bugs_norm)
 
+    def testAddDefaultReviewers(self):
+        """Testing adding default reviewers to a draft"""
+        draft = self.getDraft()
+        draft.diffset = \
+            draft.review_request.diffset_history.diffsets.latest()
+        draft.save()
+        draft.target_people.clear()
+        draft.target_groups.clear()
+
+        user = User.objects.get(username="doc")
+        js_group = Group.objects.create(name="js")
+        other_group = Group.objects.create(name="other")
+
+        default_reviewer1 = DefaultReviewer.objects.create(
+            name="JavaScript", file_regex=r".*\.js$")
+        default_reviewer1.groups.add(js_group)
+
+        default_reviewer2 = DefaultReviewer.objects.create(
+            name="Reviews", file_regex="/trunk/reviewboard/reviews/")
+        default_reviewer2.people.add(user)
+
+        default_reviewer3 = DefaultReviewer.objects.create(
+            name="Other", file_regex="/branches/")
+        default_reviewer3.groups.add(other_group)
+
+        draft.add_default_reviewers()
+
+        self.assertEqual(list(draft.target_people.all()), [user])
+        self.assertEqual(list(draft.target_groups.all()), [js_group])
+
     def getDraft(self):
         """Convenience function for getting a new draft to work with."""
         return ReviewRequestDraft.create(ReviewRequest.objects.get(
@@ -608,6 +639,12 @@ class FieldTests(TestCase):
         self.assertEqual(review_request.get_bug_list(),
                          ['4432009', '12006153200030304432010'])
 
+    def testBugListSeparators(self):
+        """Testing review request bug lists with surrounding separators"""
+        review_request = ReviewRequest()
+        review_request.bugs_closed = ' 12,\t3\n 45, '
+        self.assertEqual(review_request.get_bug_list(), ['3', '12', '45'])
+
     # Our _("(no summary)") string was failing in the admin UI, as
     # django.template.defaultfilters.stringfilter would fail on a
     # ugettext_lazy proxy object. We can use any stringfilter for this.
@@ -685,6 +722,73 @@ class ConcurrencyTests(TestCase):
         self.assertEqual(comments[2].text, comment_text_3)
 
 
+class ParticipantTests(TestCase):
+    fixtures = ['test_users', 'test_reviewrequests', 'test_scmtools']
+
+    def testParticipants(self):
+        """Testing tracking of review request participants"""
+        review_request = ReviewRequest.objects.get(
+            summary="Update for cleaned_data changes")
+        doc = User.objects.get(username='doc')
+        grumpy = User.objects.get(username='grumpy')
+        dopey = User.objects.get(username='dopey')
+
+        # doc has already reviewed this review request.
+        self.assertEqual(review_request.get_participants(), [doc])
+
+        review = Review.objects.create(review_request=review_request,
+                                       user=grumpy)
+        self.assertEqual(set(review_request.get_participants()),
+                         set([doc, grumpy]))
+
+        reply = Review.objects.create(review_request=review_request,
+                                      user=dopey,
+                                      base_reply_to=review)
+        Review.objects.create(review_request=review_request,
+                              user=dopey,
+                              base_reply_to=review)
+        participants = review_request.get_participants()
+        self.assertEqual(len(participants), 3)
+        self.assertEqual(set(participants), set([doc, grumpy, dopey]))
+
+        reply.delete()
+        self.assertEqual(set(review_request.get_participants()),
+                         set([doc, grumpy, dopey]))
+
+        Review.objects.filter(user=dopey,
+                              review_request=review_request).delete()
+        self.assertEqual(set(review_request.get_participants()),
+                         set([doc, grumpy]))
+
+
+class ReviewAccessTests(TestCase):
+    fixtures = ['test_users', 'test_reviewrequests', 'test_scmtools']
+
+    def testPublicReviewsMatchAccessChecks(self):
+        """Testing ReviewRequest.get_public_reviews against
+        Review.is_accessible_by"""
+        users = list(User.objects.all()) + [AnonymousUser()]
+
+        self._check_public_reviews(users)
+
+        Group.objects.update(ready_for_reviews=True)
+        self._check_public_reviews(users)
+
+        Group.objects.update(invite_only=True)
+        self._check_public_reviews(users)
+
+    def _check_public_reviews(self, users):
+        for review_request in ReviewRequest.objects.all():
+            reviews = review_request.reviews.filter(public=True,
+                                                    base_reply_to__isnull=True)
+
+            for user in users:
+                self.assertEqual(
+                    review_request.get_public_reviews(user),
+                    [review for review in reviews
+                     if review.is_accessible_by(user)])
+
+
 class DefaultReviewerTests(TestCase):
     fixtures = ['test_scmtools.json']
 
@@ -714,6 +818,39 @@ class DefaultReviewerTests(TestCase):
         self.assert_(len(default_reviewers) == 1)
         self.assert_(default_reviewer2 in default_reviewers)
 
+    def test_get_file_regex(self):
+        """Testing DefaultReviewer.get_file_regex caching"""
+        default_reviewer = DefaultReviewer(name="Test", file_regex="foo/.*")
+        default_reviewer.save()
+
+        regex = default_reviewer.get_file_regex()
+        self.assert_(regex.match("foo/bar.c"))
+        self.assert_(default_reviewer.get_file_regex() is regex)
+
+        default_reviewer.file_regex = "bar/.*"
+        default_reviewer.save()
+
+        regex = default_reviewer.get_file_regex()
+        self.assert_(regex.match("bar/foo.c"))
+        self.assert_(not regex.match("foo/bar.c"))
+
+    def test_matching_with_many_regex_groups(self):
+        """Testing DefaultReviewer matching with over 100 regex groups"""
+        defaults = []
+
+        for i in range(120):
+            default_reviewer = DefaultReviewer.objects.create(
+                name="Test %d" % i,
+                file_regex="(src|lib)/mod%d/.*" % i)
+            defaults.append((default_reviewer,
+                             default_reviewer.get_file_regex()))
+
+        matched = _get_matching_default_reviewers(None, defaults, [
+            ('src/mod42/foo.c', None),
+            ('lib/mod119/bar.c', None),
+        ])
+        self.assertEqual(matched, [defaults[42][0], defaults[119][0]])
+
     def test_form_with_localsite(self):
         """Testing DefaultReviewerForm with a LocalSite."""
         test_site = LocalSite.objects.create(name='test')
@@ -1332,6 +1469,34 @@ class CounterTests(TestCase):
         self.assertEqual(self.site_profile2.starred_public_request_count, 0)
         self.assertEqual(self.group.incoming_request_count, 1)
 
+    def test_republishing_requests(self):
+        """Testing counters with republishing review requests"""
+        # Only users with this permission can publish review requests.
+        self.user.user_permissions.add(
+            Permission.objects.get(codename='can_edit_reviewrequest'))
+
+        draft = ReviewRequestDraft.create(self.review_request)
+        draft.target_groups.add(self.group)
+        draft.target_people.add(self.user)
+        self.review_request.publish(self.user)
+
+        self._reload_objects()
+        self.assertEqual(self.site_profile.direct_incoming_request_count, 1)
+        self.assertEqual(self.site_profile.total_incoming_request_count, 1)
+        self.assertEqual(self.site_profile.starred_public_request_count, 1)
+        self.assertEqual(self.group.incoming_request_count, 1)
+
+        draft = ReviewRequestDraft.create(self.review_request)
+        draft.target_people.remove(self.user)
+        self.review_request.publish(self.user)
+
+        self._reload_objects()
+        self.assertEqual(self.site_profile.direct_incoming_request_count, 0)
+        self.assertEqual(self.site_profile.total_incoming_request_count, 1)
+        self.assertEqual(self.site_profile.starred_public_request_count, 1)
+        self.assertEqual(self.site_profile2.starred_public_request_count, 0)
+        self.assertEqual(self.group.incoming_request_count, 1)
+
     def _reload_objects(self):
         self.site_profile = \
             LocalSiteProfile.objects.get(pk=self.site_profile.pk)
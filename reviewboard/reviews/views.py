@@ -316,7 +316,7 @@ def review_detail(request,
     draft = review_request.get_draft(request.user)
 
     # Find out if we can bail early. Generate an ETag for this.
-    last_activity_time, updated_object = review_request.get_last_activity()
+    last_activity_time = review_request.get_last_activity_timestamp()
 
     if draft:
         draft_timestamp = draft.last_updated
@@ -745,7 +745,7 @@ def diff(request,
     if draft and draft.diffset:
         num_diffs += 1
 
-    last_activity_time, updated_object = review_request.get_last_activity()
+    last_activity_time = review_request.get_last_activity_timestamp()
 
     return view_diff(
          request, diffset, interdiffset, template_name=template_name,
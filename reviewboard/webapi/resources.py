@@ -223,7 +223,7 @@ class BaseCommentResource(WebAPIResource):
         comment.issue_status = issue_status
         comment.save()
 
-        last_activity_time, updated_object = review_request.get_last_activity()
+        last_activity_time = review_request.get_last_activity_timestamp()
 
         return 200, {
             comment_resource.item_result_key: comment,
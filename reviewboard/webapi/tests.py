@@ -3505,6 +3505,26 @@ class ReviewReplyResourceTests(BaseWebAPITestCase):
         reply = Review.objects.get(pk=rsp['reply']['id'])
         self.assertEqual(reply.body_bottom, body_bottom)
 
+    def test_get_reply_draft(self):
+        """Testing the GET review-requests/<id>/reviews/<id>/replies/draft/ API"""
+        review = \
+            Review.objects.filter(base_reply_to__isnull=True, public=True)[0]
+
+        rsp = self.apiPost(self.get_list_url(review), {
+            'body_top': 'Test',
+        })
+        self.assertEqual(rsp['stat'], 'ok')
+
+        reply = review.get_pending_reply(self.user)
+        self.assertEqual(reply.pk, rsp['reply']['id'])
+        self.assertEqual(reply.user, self.user)
+        self.assertFalse(reply.public)
+
+        response = self.client.get(self.get_list_url(review) + 'draft/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'],
+                         self.base_url + self.get_item_url(review, reply.id))
+
     def test_put_reply(self):
         """Testing the PUT review-requests/<id>/reviews/<id>/replies/<id>/ API"""
         review = \